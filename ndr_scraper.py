@@ -8,34 +8,86 @@ The user specifies the beginning and the end of the interval by entering the
 respective year and month of the first and last month. For example '2022-01' 
 for January 2022.   
 
-The script creates two csv-files in the working directory which contain
-IDs from the ndr.nl website for the events and the results of the races. If 
-errors occur a third csv-file will be generated to log the errors.
+The script creates a csv-file in the working directory which contains IDs
+from the ndr.nl website for the events and a parquet-file with the results of
+the races. If errors occur a csv-file will be generated to log the errors.
+Started with the option --csv the results are additionally exported to a
+csv-file.
 
-One can find the csv-files by name. If for example the user inputs a time 
-intervall starting with January 2022 and ending with May 2022 the three files
+The downloaded results pages are kept in the folder 'cache' in the working
+directory, so a rerun for the same months does not download them again.
+
+One can find the files by name. If for example the user inputs a time 
+intervall starting with January 2022 and ending with May 2022 the files
 would have the following names:
     events_202201to202205.csv
-    results_202201to202205.csv
+    results_202201to202205.parquet
+    results_202201to202205.csv (only with --csv)
     errors_202201to202205.csv
 '''
 
 
+import argparse
+import asyncio
 import csv
+import gzip
+import queue
 import re
-import time
+import threading
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from pathlib import Path
 
 
+import httpx
+import lxml.etree
+import lxml.html
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer, UnicodeDammit
 from dateutil.relativedelta import relativedelta
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import Select
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+# class of the list items with the events in the agenda of ndr.nl
+AGENDA_ITEM_RE = re.compile('^ndr-agenda-item')
+
+# all possible columns of the ndr.nl results pages in the order of the
+# results file, and the position of each column in a row
+RESULT_COLS = (
+    'event', 'date_track', 'race_time', 'race_number', 'race_title', 
+    'description1', 'description2', 'description3', 'race_infos',
+    'nr.', 'paard', 'rijder', 'afstand', 'startnummer', 'startnr', 
+    'box', 'tijd', 'na 1e', 'Hcap', 'prijs', 'COTE' 
+)
+RESULT_COL_INDEX = {col: i for i, col in enumerate(RESULT_COLS)}
+
+# number of rows per row group of the results parquet-file, larger groups
+# compress better and are much faster to read than one group per event
+RESULTS_ROW_GROUP_ROWS = 100000
+
+# downloaded results pages are kept here so reruns do not fetch them again
+CACHE_DIR = Path('cache')
+
+# answers of ndr.nl which are worth retrying, all other errors are permanent
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# one session for all requests to ndr.nl keeps the connection alive, failed
+# requests (the agenda POST included) are retried with a backoff
+SESSION = requests.Session()
+SESSION.mount(
+    'https://',
+    HTTPAdapter(
+        max_retries = Retry(
+            total = 3, backoff_factor = 0.5,
+            status_forcelist = RETRY_STATUSES,
+            allowed_methods = None
+        )
+    )
+)
 
 
 def get_events(months_list, events_filename):
@@ -58,63 +110,61 @@ def get_events(months_list, events_filename):
 
     '''
     months_list = [month.split('-') for month in months_list]
-    options = Options()
-    options.add_experimental_option('excludeSwitches', ['enable-logging'])
-    service = Service("chromedriver.exe")
-    driver = webdriver.Chrome(service = service, options = options)
-    driver.get('https://ndr.nl/selectieproeven/')
-    driver.maximize_window()
-    #events_list = []
-    for month in months_list:
-        my_year, my_month = month[0], month[1]
-        # selecting month and year in the two dropdown menus
-        select = Select(
-            driver.find_element(by = By.NAME, value = 'ndr-koersen-jaar')
-        )
-        select.select_by_value(my_year)
-        select = Select(
-          driver.find_element(by = By.NAME, value = 'ndr-koersen-maand')
-        )
-        select.select_by_value(my_month)
-        time.sleep(10)
-        soup = BeautifulSoup(driver.page_source, 'lxml')
-        course_results = soup.find('div', {'id':'ndr-course-results'})
-        course_results = course_results.find_all(
-          'li', {'class':re.compile('^ndr-agenda-item.*')}
-        )
-        events = [
-          [
-            dag['data-koersdag'],
-            dag.find('div', {'class':'ndr-agenda-datum'}).get_text(),
-            my_month,
-            my_year
-          ] for dag in course_results
-        ]
-        with open(
-            events_filename, 'a', newline = '', encoding = 'utf-8'
-        ) as events_out:
-            csv_events = csv.writer(events_out)
+    # the agenda on ndr.nl/selectieproeven is filled by this ajax request,
+    # so there is no need to render the page in a browser
+    url = 'https://ndr.nl/wp-admin/admin-ajax.php'
+    # while parsing the class attribute is one string, so the classes have
+    # to be matched one by one like find_all does
+    agenda_items = SoupStrainer(
+        'li',
+        {'class':lambda classes: classes is not None and any(
+            AGENDA_ITEM_RE.match(name) for name in classes.split()
+        )}
+    )
+    # the file is written anew, so a rerun does not list the events twice
+    with open(
+        events_filename, 'w', newline = '', encoding = 'utf-8'
+    ) as events_out:
+        csv_events = csv.writer(events_out)
+        for month in months_list:
+            my_year, my_month = month[0], month[1]
+            page = SESSION.post(
+                url,
+                data = {
+                    'action':'ndr_koersen', 'jaar':my_year, 'maand':my_month
+                },
+                timeout = 120
+            )
+            # a rejected request is answered with an error status (e.g. 400
+            # with body '0'), which must not pass for a month without races
+            page.raise_for_status()
+            # only build the agenda items, the rest of the answer is not needed
+            soup = BeautifulSoup(page.text, 'lxml', parse_only = agenda_items)
+            course_results = soup.find_all('li', {'class':AGENDA_ITEM_RE})
+            events = [
+              [
+                dag['data-koersdag'],
+                dag.find('div', {'class':'ndr-agenda-datum'}).get_text(),
+                my_month,
+                my_year
+              ] for dag in course_results
+            ]
             csv_events.writerows(events)
-    driver.quit()
 
 
-def get_event_results(event_id, result_cols):
+def event_url(event_id):
     '''
-    Uses the event_id from ndr.nl to go to the results webpage for this event.
-    And then combines the results of all races of one event with additional 
-    infos to each race and returns it as a pandas data frame.
+    Builds the url of the results webpage for an event.
 
     Parameters
     ----------
     event_id : str
         ID used by ndr.nl internally to identify each race day (event).
-    result_cols : list
-        A list of all possible column names of the ndr.nl results pages.
 
     Returns
     -------
-    event_results : pandas.DataFrame
-        A data frame with all results of one particular event (race day).
+    url : str
+        Url of the printable results page of the event.
 
     '''
     url = (
@@ -122,205 +172,515 @@ def get_event_results(event_id, result_cols):
         'ndr-print.php?action=do_search&koersdag=' + event_id + 
         '&koersnr=1&isAgenda=0&paard=false'
     )
-    page = requests.get(url, timeout = 120)
-    soup = BeautifulSoup(page.content, 'html.parser')
-    results = soup.find_all('div', {'class':'ndr-koers-titelbalk'})
-    results_list = []
-    for result in results:
-        leaderboard = html_to_df(result)
-        result_df = add_raceinfos_to_results(result, leaderboard)
-        result_df = add_missing_columns(result_df, event_id, result_cols)
-        # order columns
-        result_df = result_df[result_cols]
-        results_list.append(result_df)
+    return url
+
+
+def cache_path(event_id):
+    '''
+    Builds the path of the cached results webpage for an event.
+
+    Parameters
+    ----------
+    event_id : str
+        ID used by ndr.nl internally to identify each race day (event).
+
+    Returns
+    -------
+    path : pathlib.Path
+        Path of the gzipped results webpage in CACHE_DIR.
+
+    '''
+    return CACHE_DIR / (event_id + '.html.gz')
+
+
+def log_error(err, event_id, url):
+    '''
+    Appends an error together with the event and url to the errors csv-file.
+
+    Parameters
+    ----------
+    err : Exception or str
+        The error which occured.
+    event_id : str
+        ID used by ndr.nl for the events.
+    url : str
+        Url of the results webpage of the event.
+
+    Returns
+    -------
+    None.
+
+    '''
+    with open(
+      errors_csv, mode = 'a', encoding = 'utf-8', newline = ''
+    ) as errors_out:
+        csv_errs = csv.writer(errors_out)
+        csv_errs.writerow([err, event_id, url])
+
+
+async def fetch_event(client, semaphore, event_id, retries = 5):
+    '''
+    Downloads the results webpage of one event. Connection errors, timeouts
+    and answers with a status in RETRY_STATUSES are retried with an
+    exponential backoff, other answers than 200 and other request errors
+    (e.g. too many redirects) are given up on at once.
+    Downloaded pages which are not empty are cached gzipped in CACHE_DIR and
+    read from there if the event is requested again.
+
+    Parameters
+    ----------
+    client : httpx.AsyncClient
+        HTTP/2 client shared by all downloads.
+    semaphore : asyncio.Semaphore
+        Limits the number of downloads running at the same time.
+    event_id : str
+        ID used by ndr.nl internally to identify each race day (event).
+    retries : int, optional
+        Number of attempts before giving up. The default is 5.
+
+    Returns
+    -------
+    event_id : str
+        ID of the downloaded event.
+    page_content : bytes or None
+        Content of the results webpage, None if the download failed.
+
+    '''
+    cache_file = cache_path(event_id)
+    if cache_file.exists():
+        try:
+            return event_id, gzip.decompress(cache_file.read_bytes())
+        except (OSError, EOFError):
+            # broken cache file, download the page again
+            cache_file.unlink(missing_ok = True)
+    url = event_url(event_id)
+    async with semaphore:
+        for attempt in range(retries):
+            # wait before each retry, but not before the first attempt
+            if attempt > 0:
+                await asyncio.sleep(2 ** (attempt - 1))
+            try:
+                response = await client.get(url)
+            except httpx.TransportError as err:
+                error = type(err).__name__ + ': ' + str(err)
+                continue
+            except httpx.RequestError as err:
+                # too many redirects or a broken body, retrying will not help
+                error = type(err).__name__ + ': ' + str(err)
+                break
+            if response.status_code == 200:
+                page_content = response.content
+                if page_content.strip():
+                    # write to a temporary file first, so an interrupted run
+                    # does not leave a truncated cache file behind
+                    CACHE_DIR.mkdir(exist_ok = True)
+                    temp_file = cache_file.with_suffix('.tmp')
+                    temp_file.write_bytes(gzip.compress(page_content))
+                    temp_file.replace(cache_file)
+                return event_id, page_content
+            error = 'HTTP status ' + str(response.status_code)
+            if response.status_code not in RETRY_STATUSES:
+                break
+    log_error(error, event_id, url)
+    return event_id, None
+
+
+def parse_event_results(event_id, page_content):
+    '''
+    Combines the results of all races of one event from the results webpage
+    with additional infos to each race and returns them as rows for the
+    results file.
+
+    Parameters
+    ----------
+    event_id : str
+        ID used by ndr.nl internally to identify each race day (event).
+    page_content : bytes or None
+        Content of the results webpage of the event.
+
+    Returns
+    -------
+    event_results : list of list of str
+        All results of one particular event (race day), each row ordered
+        like RESULT_COLS.
+
+    Raises
+    ------
+    ValueError
+        If the webpage contains no results. The error is raised instead of
+        logged because this function runs in a worker process.
+
+    '''
+    if page_content is None:
+        return []
+    # detect the encoding like BeautifulSoup does, lxml alone would read
+    # pages without a charset declaration as latin-1
+    encoding = UnicodeDammit(page_content, is_html = True).original_encoding
+    parser = lxml.html.HTMLParser(encoding = encoding)
     try:
-        event_results = pd.concat(results_list)
-    except ValueError as err:
-        with open(
-          errors_csv, mode = 'a', encoding = 'utf-8', newline = ''
-        ) as errors_out:
-            csv_errs = csv.writer(errors_out)
-            csv_errs.writerow([err, event, url])
-        event_results = pd.DataFrame()
+        tree = lxml.html.fromstring(page_content, parser = parser)
+    except lxml.etree.ParserError:
+        # empty page, the ParserError itself cannot be sent back from the
+        # worker process
+        raise ValueError('No results found') from None
+    results = tree.find_class('ndr-koers-titelbalk')
+    if len(results) == 0:
+        raise ValueError('No results found')
+    event_results = []
+    for result in results:
+        header, leaderboard = html_to_rows(result)
+        race_infos = get_raceinfos(result)
+        event_results.extend(
+            add_missing_columns(
+                header, leaderboard, race_infos, event_id
+            )
+        )
     return event_results
 
 
-def html_to_df(result_soup):
+async def get_event_results(event_ids, results_queue):
     '''
-    Extracts a table between the html table tags and returns it as a pandas 
-    data frame.
+    Downloads the results webpages of all events concurrently, multiplexed
+    over HTTP/2 connections, and parses each page in a pool of worker
+    processes (one per CPU) as soon as it has arrived, so parsing runs on all
+    cores and overlaps with the downloads still running. The rows of each
+    event are put into the queue of the writer thread in the order of
+    event_ids.
 
     Parameters
     ----------
-    result_soup : TYPE
-        DESCRIPTION.
+    event_ids : list of str
+        IDs used by ndr.nl internally to identify each race day (event).
+    results_queue : queue.Queue
+        Queue of the writer thread, receives the rows of one event at a time.
 
     Returns
     -------
-    result_df : TYPE
-        DESCRIPTION.
+    None.
 
     '''
-    table_soup = result_soup.find('table')
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(16)
+    limits = httpx.Limits(max_connections = 16)
+
+    async def fetch_and_parse(client, event_id):
+        event_id, page_content = await fetch_event(
+            client, semaphore, event_id
+        )
+        try:
+            return await loop.run_in_executor(
+                pool, parse_event_results, event_id, page_content
+            )
+        except ValueError as err:
+            log_error(err, event_id, event_url(event_id))
+            # do not keep a page without results, so a rerun fetches it again
+            cache_path(event_id).unlink(missing_ok = True)
+            return []
+
+    with ProcessPoolExecutor() as pool:
+        # unlike requests and aiohttp, httpx does not follow redirects on
+        # its own
+        async with httpx.AsyncClient(
+            http2 = True, limits = limits, timeout = 120,
+            follow_redirects = True
+        ) as client:
+            tasks = [
+                asyncio.create_task(fetch_and_parse(client, event))
+                for event in event_ids
+            ]
+            for task in tasks:
+                event_results = await task
+                # put blocks while the queue is full, so wait for it in a
+                # thread instead of in the event loop
+                await loop.run_in_executor(
+                    None, results_queue.put, event_results
+                )
+
+
+def write_results(results_queue, results_filename, writer_errors):
+    '''
+    Writes the rows of each event from the queue to the parquet-file until
+    None is received. Runs in its own thread, so it is the only place where
+    results get serialized. Rows are collected and written in row groups of
+    RESULTS_ROW_GROUP_ROWS rows, the rest once before the file is closed. If
+    writing fails the error is kept in writer_errors and the queue is still
+    emptied until None is received, so the producer never blocks on a full
+    queue.
+
+    Parameters
+    ----------
+    results_queue : queue.Queue
+        Queue with the rows of one event at a time, None marks the end.
+    results_filename : str
+        Name of the parquet-file for the results.
+    writer_errors : list
+        Receives the exception if writing fails, to be raised again by the
+        main thread.
+
+    Returns
+    -------
+    None.
+
+    '''
+    done = False
+    try:
+        schema = pa.schema([(col, pa.string()) for col in RESULT_COLS])
+        with pq.ParquetWriter(
+            results_filename, schema, compression = 'zstd'
+        ) as writer:
+            batch = []
+            while True:
+                event_results = results_queue.get()
+                if event_results is None:
+                    done = True
+                    break
+                batch.extend(event_results)
+                # write full row groups only, the rest waits for more rows
+                while len(batch) >= RESULTS_ROW_GROUP_ROWS:
+                    writer.write_table(
+                        rows_to_table(batch[:RESULTS_ROW_GROUP_ROWS], schema),
+                        row_group_size = RESULTS_ROW_GROUP_ROWS
+                    )
+                    del batch[:RESULTS_ROW_GROUP_ROWS]
+            if len(batch) > 0:
+                writer.write_table(
+                    rows_to_table(batch, schema),
+                    row_group_size = RESULTS_ROW_GROUP_ROWS
+                )
+    except Exception as err:
+        writer_errors.append(err)
+        while not done:
+            done = results_queue.get() is None
+
+
+def rows_to_table(rows, schema):
+    '''
+    Turns the result rows of an event into a table for the parquet-file.
+
+    Parameters
+    ----------
+    rows : list of list of str
+        All results of one event, each row ordered like the schema.
+    schema : pyarrow.Schema
+        Schema of the results with a string field for each column.
+
+    Returns
+    -------
+    table : pyarrow.Table
+        Table with the results of the event.
+
+    '''
+    columns = [
+        pa.array(column, pa.string()) for column in zip(*rows)
+    ]
+    return pa.Table.from_arrays(columns, schema = schema)
+
+
+def html_to_rows(result_node):
+    '''
+    Extracts a table between the html table tags and returns its header and
+    rows as lists of strings.
+
+    Parameters
+    ----------
+    result_node : lxml.html.HtmlElement
+        Element with the results table of a race.
+
+    Returns
+    -------
+    header : list of str
+        Column names of the table.
+    rows : list of list of str
+        Cell texts of the table rows.
+
+    '''
+    header = []
     rows = []
-    table_rows = table_soup.find_all('tr')
+    table_rows = result_node.xpath('(.//table)[1]//tr')
     # does a table exist?
     if len(table_rows) > 0:
         # extract table header
-        table_header = []
-        cells = table_rows[0].find_all('th')
-        for cell in cells:
-            table_header.append(cell.get_text().strip())
+        for cell in table_rows[0].xpath('.//th'):
+            header.append(''.join(cell.itertext()).strip())
         # extract table data
         for table_row in table_rows[1:]:
             row = []
-            cells = table_row.find_all('td')
-            for cell in cells:
-                cell_text = cell.get_text().strip()
-                cell_text = re.sub(' +', ' ', cell_text)
-                row.append(cell_text)
+            for cell in table_row.xpath('.//td'):
+                # strip and collapse whitespace within the cell
+                row.append(' '.join(''.join(cell.itertext()).split()))
+            # pad rows with fewer cells than columns
+            row.extend([''] * (len(header) - len(row)))
             rows.append(row)
-        result_df = pd.DataFrame(rows, columns = table_header)
-    else:
-        result_df = pd.DataFrame()
-    return result_df
+    return header, rows
 
 
-def add_raceinfos_to_results(result_soup, result_df):
+def get_raceinfos(result_node):
     '''
-    Add additional infos to a race (title, time, track etc.) to the results
-    data frame.
+    Get additional infos to a race (title, time, track etc.) which are shown
+    above the results table.
 
     Parameters
     ----------
-    result_soup : bs4.element.Tag
-        Tag and the parsed contents of a tag.
-    result_df : pandas.DataFrame
-        Data frame with the results of a race.
+    result_node : lxml.html.HtmlElement
+        Element with the results table and infos of a race.
 
     Returns
     -------
-    result_df : pandas.DataFrame
-        Data frame with the results of a race.
+    race_infos : dict
+        Race infos by column name.
 
     '''
     # get race infos which are not integrated into table but above
-    print(type(result_soup))
-    result_df['race_number'] = result_soup.find(
-        'div', {'class':'ndr-koers-naam'}
-    ).get_text()
-    result_df['race_time'] = result_soup.find(
-        'div', {'class':'ndr-koers-tijd'}
-    ).get_text()
-    koers_titel = result_soup.find('div', {'class':'ndr-koers-titel'})
-    result_df['race_title'] = koers_titel.find('h2').get_text()
-    race_description = koers_titel.find_all(
-      'span', {'class':'ndr-koers-omschrijving'}
+    race_infos = {}
+    race_infos['race_number'] = result_node.find_class(
+        'ndr-koers-naam'
+    )[0].text_content()
+    race_infos['race_time'] = result_node.find_class(
+        'ndr-koers-tijd'
+    )[0].text_content()
+    koers_titel = result_node.find_class('ndr-koers-titel')[0]
+    race_infos['race_title'] = koers_titel.find('.//h2').text_content()
+    race_description = koers_titel.find_class('ndr-koers-omschrijving')
+    # the results file has room for three descriptions
+    for i, description in enumerate(race_description[:3], 1):
+        race_infos['description' + str(i)] = description.text_content()
+    koers_datum_baan = koers_titel.find_class('ndr-koers-datum-baan')
+    race_infos['date_track'] = (
+        koers_datum_baan[0].text_content() if len(koers_datum_baan) > 0
+        else ''
     )
-    if len(race_description) == 1:
-        result_df['description1'] = race_description[0].get_text()
-    elif len(race_description) == 2:
-        result_df['description1'] = race_description[0].get_text()
-        result_df['description2'] = race_description[1].get_text()
-    elif len(race_description) == 3:
-        result_df['description1'] = race_description[0].get_text()
-        result_df['description2'] = race_description[1].get_text()
-        result_df['description3'] = race_description[2].get_text()
-    koers_datum_baan = koers_titel.find_all(
-        'span', {'class':'ndr-koers-datum-baan'}
+    race_infos['race_infos'] = (
+        koers_datum_baan[1].text_content() if len(koers_datum_baan) > 1
+        else ''
     )
-    result_df['date_track'] = koers_datum_baan[0].get_text()
-    result_df['race_infos'] = koers_datum_baan[1].get_text()
-    return result_df
+    return race_infos
 
 
 
-def add_missing_columns(result_df, event_id, result_cols):
+def add_missing_columns(header, rows, race_infos, event_id):
     '''
-    Adds missing columns of all possible columns to result data frame so the
-    result csv is easily appendable.
+    Puts the cells of each row to their position among all possible columns,
+    adds the race infos and the event_id and fills missing columns with empty
+    strings, so all rows of the results csv have the same columns.
 
     Parameters
     ----------
-    result_df : pandas.DataFrame
-        Data Frame with race results.
+    header : list of str
+        Column names of the race results.
+    rows : list of list of str
+        Race results.
+    race_infos : dict
+        Race infos by column name, the same for all rows of the race.
     event_id : str
         ID used by ndr.nl for the events.
-    result_cols : list
-        List of all possible columns.
 
     Returns
     -------
-    result_df : pandas.DataFrame
-        Resulting data frame with all possible columns.
+    full_rows : list of list of str
+        Resulting rows with all possible columns.
 
     '''
-    # add event_id to data frame
-    result_df['event'] = event_id
-    missing_cols = [
-        col for col in result_cols if col not in result_df.columns
+    # target position of each cell, columns which are not part of all
+    # possible columns get dropped
+    positions = [
+        (i, RESULT_COL_INDEX[col]) for i, col in enumerate(header)
+        if col in RESULT_COL_INDEX
     ]
-    result_df.loc[:, missing_cols] = ''
-    return result_df
-
-
-
-
-# Start of the script
-print(__doc__)
-
-# user input:
-# scraper fetches dutch horse racing results between two months which the user
-# has to declare
-first_month = input(
-    "Please enter the start of the interval by typing year and month " +
-    "(e.g. '2013-02' for February 2013): "
-)
-last_month = input(
-    "Please enter the end of the interval by typing year and month " +
-    "(e.g. '2013-02' for February 2013): "
-)
-start_date = first_month + '-01'
-end_date = datetime.strptime(last_month + '-01', '%Y-%m-%d').date()
-end_date += relativedelta(months = 1)
-my_months = pd.date_range(
-    start_date, end_date, freq = 'M'
-).strftime('%Y-%#m').to_list()
-
-
-# build names for the three csv files, which are the main output of this script
-events_csv = (
-    'events_' + first_month.replace('-', '') + 'to' + 
-    last_month.replace('-', '') + '.csv'
-)
-results_csv = (
-    'results_' + first_month.replace('-', '') + 'to' + 
-    last_month.replace('-', '') + '.csv'
-)
-errors_csv = (
-    'errors_' + first_month.replace('-', '') + 'to' + 
-    last_month.replace('-', '') + '.csv'
-)
-# get all the event or "koersdagen" ids and write to csv file
-get_events(my_months, events_csv)
-# read all event ids
-with open(events_csv, 'rt', encoding = 'utf-8') as fin:
-    cin = csv.reader(fin)
-    my_events = [row[0] for row in cin]
-# get the race result for all events in list and write to a second csv file
-all_cols = [
-    'event', 'date_track', 'race_time', 'race_number', 'race_title', 
-    'description1', 'description2', 'description3', 'race_infos',
-    'nr.', 'paard', 'rijder', 'afstand', 'startnummer', 'startnr', 
-    'box', 'tijd', 'na 1e', 'Hcap', 'prijs', 'COTE' 
-]
-# write header to csv
-with open(results_csv, 'a', newline = '', encoding = 'utf-8') as fout:
-    csvout = csv.writer(fout)
-    csvout.writerow(all_cols)
-
-for event in my_events:
-    event_results_df = get_event_results(event, all_cols)
-    event_results_df.to_csv(
-        results_csv, header = False, index = False, mode = 'a'
+    # race infos and event_id are the same for every row, so they are filled
+    # in once and each row starts as a copy
+    template = [''] * len(RESULT_COLS)
+    for col, value in race_infos.items():
+        template[RESULT_COL_INDEX[col]] = value
+    template[RESULT_COL_INDEX['event']] = event_id
+    full_rows = []
+    for row in rows:
+        full_row = template.copy()
+        for source, target in positions:
+            full_row[target] = row[source]
+        full_rows.append(full_row)
+    return full_rows
+
+
+
+
+# Start of the script, guarded so the worker processes which parse the
+# results pages can import this module without running it
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--csv', action = 'store_true',
+        help = 'additionally export the results to a csv-file'
+    )
+    args = parser.parse_args()
+    print(__doc__)
+
+    # user input:
+    # scraper fetches dutch horse racing results between two months which the
+    # user has to declare
+    first_month = input(
+        "Please enter the start of the interval by typing year and month " +
+        "(e.g. '2013-02' for February 2013): "
     )
+    last_month = input(
+        "Please enter the end of the interval by typing year and month " +
+        "(e.g. '2013-02' for February 2013): "
+    )
+    start_date = first_month + '-01'
+    end_date = datetime.strptime(last_month + '-01', '%Y-%m-%d').date()
+    end_date += relativedelta(months = 1)
+    my_months = pd.date_range(
+        start_date, end_date, freq = 'M'
+    ).strftime('%Y-%#m').to_list()
+
+
+    # build names for the output files of this script
+    events_csv = (
+        'events_' + first_month.replace('-', '') + 'to' + 
+        last_month.replace('-', '') + '.csv'
+    )
+    results_parquet = (
+        'results_' + first_month.replace('-', '') + 'to' + 
+        last_month.replace('-', '') + '.parquet'
+    )
+    results_csv = (
+        'results_' + first_month.replace('-', '') + 'to' + 
+        last_month.replace('-', '') + '.csv'
+    )
+    errors_csv = (
+        'errors_' + first_month.replace('-', '') + 'to' + 
+        last_month.replace('-', '') + '.csv'
+    )
+    # errors of an earlier run for the same interval are not kept
+    Path(errors_csv).unlink(missing_ok = True)
+    # get all the event or "koersdagen" ids and write to csv file
+    get_events(my_months, events_csv)
+    # read all event ids
+    try:
+        my_events = pd.read_csv(
+            events_csv, header = None, usecols = [0], dtype = str,
+            keep_default_na = False, encoding = 'utf-8', engine = 'c'
+        )[0].tolist()
+    except pd.errors.EmptyDataError:
+        # no events in the whole interval
+        my_events = []
+    # get the race result for all events in list and write to a parquet file
+    results_queue = queue.Queue(maxsize = 64)
+    writer_errors = []
+    writer_thread = threading.Thread(
+        target = write_results,
+        args = (results_queue, results_parquet, writer_errors)
+    )
+    writer_thread.start()
+    try:
+        asyncio.run(get_event_results(my_events, results_queue))
+    finally:
+        # tell the writer thread to close the file
+        results_queue.put(None)
+        writer_thread.join()
+    if writer_errors:
+        raise writer_errors[0]
+    # export to csv only if the user asked for it
+    if args.csv:
+        # pandas writes the same csv format as earlier versions of the
+        # script, pyarrow would quote every field
+        pd.read_parquet(results_parquet).to_csv(results_csv, index = False)